@@ -21,6 +21,10 @@ class _BlockMarker(Enum):
     EXEC_END   = b'\x1bPkmux;EXECEND;1b3e62c774b44f78898be928a7aa6532\x1b\\'
 
 
+_RENDER_CACHE_SIZE = 8
+"""The maximum number of rendered command outputs cached per session."""
+
+
 EDIT_START_BRACKET_CODE = b'\x1b[200~'
 EDIT_END_BRACKET_CODE = b'\x1b[201~'
 
@@ -147,7 +151,10 @@ class CommandSubmissionResult(BaseModel):
 
 class _CommandBlock(BaseModel):
     command_parts: list[bytes]
-    output: str | None
+    output_span: tuple[int, int] | None
+    """The `(start, end)` offsets of the command output in the parsed output, or None if the command is incomplete."""
+    finished: bool = False
+    """Whether the command has finished executing, i.e., `end` is the offset of an EXEC_END marker."""
 
     @property
     def combined_command(self) -> bytes:
@@ -199,6 +206,9 @@ class BlockPtySession:
         self._screen_height = screen_height
 
         self._cumulative_output: bytes = b''
+        # Rendered outputs of finished commands keyed by `(start, end)` offsets;
+        # since the cumulative output is append-only, these never change
+        self._render_cache: dict[tuple[int, int], str] = {}
         self._root_password = root_password
         self._tool_lock = asyncio.Lock()
         self._session_idle_event = asyncio.Event()
@@ -282,9 +292,11 @@ class BlockPtySession:
                 end_time = datetime.now(UTC)
                 duration = (end_time - start_time).total_seconds()
 
-                last_block = self._parse_output(self._cumulative_output)[-1]
+                cumulative_output = self._cumulative_output
+                last_block = self._parse_output(cumulative_output)[-1]
+                last_block_output = self._render_block_output(cumulative_output, last_block)
 
-                if last_block.output is None:
+                if last_block_output is None:
                     # Incomplete command; command is not executed
                     return CommandSubmissionResult(
                         result_type='command_incomplete',
@@ -295,10 +307,10 @@ class BlockPtySession:
                     )
                 else:
                     # Command successfully submitted and sent for execution
-                    # TODO: Could there be a case where `last_block.output` is not `None` but the command has not finished executing?
+                    # TODO: Could there be a case where `last_block_output` is not `None` but the command has not finished executing?
                     return CommandSubmissionResult(
                         result_type='finished',
-                        output=last_block.output,
+                        output=last_block_output,
                         command_buffer=combined_command_buffer,
                         duration_seconds=duration,
                         timeout_seconds=None
@@ -306,11 +318,12 @@ class BlockPtySession:
             except asyncio.TimeoutError:
                 # Command timed out
                 # TODO: Does it work for the case where it's the parsing by Zsh that timed out?
-                last_block = self._parse_output(self._cumulative_output)[-1]
+                cumulative_output = self._cumulative_output
+                last_block = self._parse_output(cumulative_output)[-1]
                 
                 return CommandSubmissionResult(
                     result_type='timeout',
-                    output=last_block.output,
+                    output=self._render_block_output(cumulative_output, last_block),
                     command_buffer=combined_command_buffer,
                     duration_seconds=None,
                     timeout_seconds=timeout_seconds
@@ -336,9 +349,7 @@ class BlockPtySession:
             # There's a command currently executing
             last_exec_end_index = cumulative_output.rfind(_BlockMarker.EXEC_END.value)
             return self._render(
-                cumulative_output[
-                    last_exec_end_index + len(_BlockMarker.EXEC_END.value) if last_exec_end_index != -1 else 0:
-                ]
+                cumulative_output[last_exec_end_index + len(_BlockMarker.EXEC_END.value) if last_exec_end_index != -1 else 0:]
             )
         elif session_status == _SessionStatus.AWAITING_COMMAND:
             # Render everything after the second-to-last EXEC_END marker
@@ -389,9 +400,10 @@ class BlockPtySession:
         :return: The rendered screen.
         """
 
-        # TODO: Potential performance issue:
-        # Right now we're instantiating a new pyte.HistoryScreen each time we call this method.
-        
+        # A fresh renderer is built (and freed) per call; a renderer kept alive per session would avoid re-parsing,
+        # but would also retain up to `MAX_HISTORY_LINES` of pyte history for the whole session.
+        # Repeated renders of finished command outputs are served by `_render_block_output` instead.
+
         data = data \
             .replace(_BlockMarker.EDIT_START.value, b'') \
             .replace(_BlockMarker.EDIT_END.value, b'') \
@@ -403,6 +415,37 @@ class BlockPtySession:
         # FIXME: This would remove the deliberately added leading and trailing blank lines and spaces in the original bytes as well
         return content.rstrip()
     
+    def _render_block_output(self, output: bytes, block: _CommandBlock) -> str | None:
+        """Renders the output of a command block parsed from `output`,
+        reusing the result of a previous render if the command has finished.
+
+        :param output: The output (a snapshot of the cumulative output) the block was parsed from.
+        :param block: The command block.
+        :return: The rendered command output, or None if the command is incomplete.
+        """
+
+        if block.output_span is None:
+            return None
+
+        start, end = block.output_span
+
+        if not block.finished:
+            # The output of a running command keeps growing; caching it would only retain dead entries
+            return self._render(output[start:end])
+
+        rendered = self._render_cache.get(block.output_span)
+
+        if rendered is None:
+            rendered = self._render(output[start:end])
+
+            if len(self._render_cache) >= _RENDER_CACHE_SIZE:
+                # Evict the oldest entry
+                del self._render_cache[next(iter(self._render_cache))]
+
+            self._render_cache[block.output_span] = rendered
+
+        return rendered
+    
     def _on_new_output(self, data: bytes):
         old_cumulative_output = self._cumulative_output
         self._cumulative_output += data
@@ -518,11 +561,11 @@ class BlockPtySession:
                 assert next_edit_end == -1 or next_edit_end >= exec_end, "Detected EDITEND before EXECEND"
                 assert next_exec_start == -1 or next_exec_start >= exec_end, "Detected nested EXECSTART before EXECEND"
 
-                command_output = output[cursor:exec_end]
                 blocks.append(
                     _CommandBlock(
                         command_parts=command_parts,
-                        output=self._render(command_output),
+                        output_span=(cursor, exec_end),
+                        finished=True,
                     )
                 )
                 
@@ -542,7 +585,7 @@ class BlockPtySession:
                 blocks.append(
                     _CommandBlock(
                         command_parts=command_parts,
-                        output=None
+                        output_span=None
                     )
                 )
         elif state == _ParseState.WAIT_EXEC_END:
@@ -551,7 +594,7 @@ class BlockPtySession:
             blocks.append(
                 _CommandBlock(
                     command_parts=command_parts,
-                    output=self._render(output[cursor:])
+                    output_span=(cursor, len(output))
                 )
             )
 
@@ -4,12 +4,15 @@ TODO: Possible resource leaks on unsuccessful startup
 
 from pathlib import Path
 import os
-import asyncio
+import sys
 import pty
+import asyncio
 from typing import Callable
 import fcntl
 import termios
 import struct
+import functools
+import itertools
 import errno
 import signal
 import psutil
@@ -17,6 +20,7 @@ import logging
 from enum import Enum
 import uuid
 import shutil
+from collections import deque
 
 import aiofiles
 
@@ -24,6 +28,88 @@ import aiofiles
 logger = logging.getLogger(__name__)
 
 
+@functools.cache
+def _get_original_zshrc_path() -> Path:
+    """Returns the path of the user's own `.zshrc`, which every session sources before applying its patch.
+
+    Computed on first use rather than at import time, since `Path.home()` raises when the home directory cannot be
+    determined; cached since neither `ZDOTDIR` nor the home directory changes during the server's lifetime.
+    """
+    return Path(os.getenv("ZDOTDIR") or Path.home()).resolve() / ".zshrc"
+
+
+_READ_BUFFER_SIZE = 65536
+"""The maximum number of bytes requested by each read from the pty session master FD."""
+
+_MAX_READS_PER_WAKEUP = 8
+"""The maximum number of reads from the pty session master FD per readiness callback."""
+
+
+def _get_max_write_chunks_per_call() -> int:
+    # `sysconf` reports -1 when the limit is indeterminate; POSIX guarantees at least 16
+    iov_max = os.sysconf("SC_IOV_MAX") if "SC_IOV_MAX" in os.sysconf_names else -1
+    return min(iov_max, 1024) if iov_max > 0 else 16
+
+
+_MAX_WRITE_CHUNKS_PER_CALL = _get_max_write_chunks_per_call()
+"""The maximum number of pending chunks flushed to the pty session master FD per `writev` call."""
+
+
+@functools.cache
+def _pack_winsize(rows: int, cols: int) -> bytes:
+    """Packs a `struct winsize` for `TIOCSWINSZ`; cached since sessions almost always share the same size."""
+    return struct.pack("HHHH", rows, cols, 0, 0)
+
+
+def _spawn_zsh(env: dict[str, str]) -> tuple[int, int]:
+    """Spawns an interactive zsh process on a new pty.
+
+    :param env: The environment variables of the zsh process.
+    :return: The PID of the zsh process and the pty master FD.
+    """
+
+    if sys.platform != "linux":
+        # Elsewhere (e.g., macOS and BSDs) the child must acquire its controlling terminal with `TIOCSCTTY`,
+        # which `posix_spawn` cannot do; `pty.fork` does it
+        pid, master_fd = pty.fork()
+
+        if pid == 0:
+            # Child process: exec zsh (interactive)
+            try:
+                os.execvpe("zsh", ["zsh", "-i"], env)
+            finally:
+                os._exit(127)
+
+        return pid, master_fd
+
+    master_fd, slave_fd = os.openpty()
+
+    try:
+        # Spawn zsh without duplicating the whole server process as `pty.fork` would;
+        # the child starts a new session and opens the slave end by path
+        # (on Linux, a session leader opening a tty without `O_NOCTTY` acquires it as its controlling terminal),
+        # then uses it as stdin, stdout and stderr
+        pid = os.posix_spawnp(
+            "zsh",
+            ["zsh", "-i"],
+            env,
+            file_actions=[
+                (os.POSIX_SPAWN_OPEN, 0, os.ttyname(slave_fd), os.O_RDWR, 0),
+                (os.POSIX_SPAWN_DUP2, 0, 1),
+                (os.POSIX_SPAWN_DUP2, 0, 2),
+            ],
+            setsid=True,
+        )
+    except BaseException:
+        os.close(master_fd)
+        raise
+    finally:
+        # The child holds its own handle to the slave end
+        os.close(slave_fd)
+
+    return pid, master_fd
+
+
 class PtySessionStatus(Enum):
     NOT_STARTED = 'not_started'
     RUNNING = 'running'
@@ -65,9 +151,9 @@ class PtySession:
 
         # Receiver end for the pty session master FD
         self._rx_q: asyncio.Queue[bytes] = asyncio.Queue()
-        # Sender end for the pty session master FD
-        self._tx_q: asyncio.Queue[bytes] = asyncio.Queue()
-        self._chunk_to_be_written: bytes | None = None
+        # Sender end for the pty session master FD;
+        # pending chunks are coalesced and flushed together with `writev` once the FD is writable
+        self._pending_writes: deque[bytes] = deque()
         self._child_exited_event: asyncio.Event = asyncio.Event()
 
         self._pid: int
@@ -110,34 +196,41 @@ class PtySession:
         try:
             await self._configure_zshrc(tmp_zshrc_directory)
 
-            pid, master_fd = pty.fork()
+            env = os.environ.copy()
+            env["ZDOTDIR"] = str(tmp_zshrc_directory)
 
-            if pid == 0:
-                # Child process: exec zsh (interactive)
-                env = os.environ.copy()
-                env["ZDOTDIR"] = str(tmp_zshrc_directory)
-                os.execvpe("zsh", ["zsh", "-i"], env)
-            else:
-                # Parent process: store handles
-                self._pid = pid
-                self._master_fd = master_fd
+            pid, master_fd = _spawn_zsh(env)
+
+            # Store handles
+            self._pid = pid
+            self._master_fd = master_fd
 
+            try:
                 # Make master FD non-blocking
-                flags = fcntl.fcntl(master_fd, fcntl.F_GETFL)
-                fcntl.fcntl(master_fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+                os.set_blocking(master_fd, False)
 
                 # Optionally set initial window size (rows, cols)
                 #    You can expose this as an API; here we set a sane default.
-                rows, cols = self._screen_height, self._screen_width
                 fcntl.ioctl(
                     master_fd,
                     termios.TIOCSWINSZ,
-                    struct.pack("HHHH", rows, cols, 0, 0),
+                    _pack_winsize(self._screen_height, self._screen_width),
                 )
 
-            # Guaranteed to be in the parent process if we're at this point
-            # Register self._on_readable to be called whenever the master file descriptor is readable
-            asyncio.get_running_loop().add_reader(self._master_fd, self._on_readable)
+                # Register self._on_readable to be called whenever the master file descriptor is readable
+                asyncio.get_running_loop().add_reader(self._master_fd, self._on_readable)
+            except BaseException:
+                # The session never becomes started, so `stop` cannot clean up after it;
+                # release the child process and the master FD here
+                self._remove_reader_and_writer()
+                os.close(master_fd)
+
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+                raise
 
             # Start the output reader loop
             self._output_reader_task = asyncio.create_task(self._read_output_loop())
@@ -177,14 +270,17 @@ class PtySession:
 
     def _on_readable(self):
         # Called by event loop when PTY master is readable
+        chunks: list[bytes] = []
+
         try:
-            while True:
-                chunk = os.read(self._master_fd, 65536)
+            # Bound the reads per wakeup so that a flood of output cannot starve the event loop;
+            # the reader callback fires again on the next iteration if more data is available
+            for _ in range(_MAX_READS_PER_WAKEUP):
+                chunk = os.read(self._master_fd, _READ_BUFFER_SIZE)
                 if not chunk:
                     break
 
-                # Guaranteed success since the queue is created with infinite size
-                self._rx_q.put_nowait(chunk)
+                chunks.append(chunk)
         except OSError as e:
             if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
                 return
@@ -195,27 +291,22 @@ class PtySession:
                 return
             else:
                 raise
+        finally:
+            # Queue everything read in this wakeup as a single chunk;
+            # a single read (the common case) is queued as-is without copying
+            if chunks:
+                # Guaranteed success since the queue is created with infinite size
+                self._rx_q.put_nowait(chunks[0] if len(chunks) == 1 else b"".join(chunks))
 
     def _on_writable_or_new_write_data(self):
         # Called by the event loop when PTY master is writable
-        while True:
+        pending = self._pending_writes
+
+        while pending:
             try:
-                if self._chunk_to_be_written:
-                    bytes_written = os.write(self._master_fd, self._chunk_to_be_written)
-                    if bytes_written < len(self._chunk_to_be_written):
-                        self._chunk_to_be_written = self._chunk_to_be_written[
-                            bytes_written:
-                        ]
-                    else:
-                        self._chunk_to_be_written = None
-
-                if self._chunk_to_be_written is None:
-                    try:
-                        self._chunk_to_be_written = self._tx_q.get_nowait()
-                    except asyncio.QueueEmpty:
-                        # No more write content (for now); disable writer to avoid busy waiting
-                        self._disable_writer()
-                        break
+                bytes_written = os.writev(
+                    self._master_fd, list(itertools.islice(pending, _MAX_WRITE_CHUNKS_PER_CALL))
+                )
             except OSError as e:
                 if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
                     return
@@ -227,6 +318,19 @@ class PtySession:
                 else:
                     raise
 
+            # Drop the fully written chunks and keep the unwritten remainder of a partially written one
+            while bytes_written:
+                chunk = pending[0]
+                if bytes_written < len(chunk):
+                    pending[0] = chunk[bytes_written:]
+                    break
+
+                pending.popleft()
+                bytes_written -= len(chunk)
+        
+        # No more write content (for now); disable writer to avoid busy waiting
+        self._disable_writer()
+
     def _stop(self):
         if self._finished:
             # Already finished; return
@@ -265,16 +369,15 @@ class PtySession:
     async def _write_bytes(self, data: bytes):
         """Write bytes to the pty session."""
 
-        # Put the data into the write data queue
-        await self._tx_q.put(data)
+        # Append the data to the pending writes
+        if data:
+            self._pending_writes.append(data)
 
         # Register writer callback
         self._enable_writer()
     
     async def _configure_zshrc(self, directory: Path):
-        original_zshrc_path = (
-            Path(os.getenv("ZDOTDIR") or Path.home()).resolve() / ".zshrc"
-        )
+        original_zshrc_path = _get_original_zshrc_path()
 
         if original_zshrc_path.is_file():
             async with aiofiles.open(original_zshrc_path, mode="r") as f:
@@ -6,6 +6,10 @@ import pyte
 logger = logging.getLogger(__name__)
 
 
+MAX_HISTORY_LINES = 10_000
+"""The maximum number of scrollback lines kept when rendering, like a real terminal would."""
+
+
 def _line_to_text(line: pyte.screens.StaticDefaultDict[int, pyte.screens.Char]) -> str:
     # history stores lines as lists of Char; extract .data
     return "".join(line[key].data for key in sorted(line.keys()))
@@ -21,13 +25,13 @@ def render_bytes(data: bytes, screen_width: int = 80, screen_height: int = 24) -
     """
     
     # FIXME: Is this way of counting lines robust enough?
-    lines = max(len(data.split(b'\n')), len(data.split(b'\r')), len(data.split(b'\r\n')), screen_height) + 100
+    lines = min(max(data.count(b'\n'), data.count(b'\r'), screen_height) + 100, MAX_HISTORY_LINES)
 
     screen = pyte.HistoryScreen(columns=screen_width, lines=screen_height, history=lines)
-    stream = pyte.Stream(screen)
-    
+    # `ByteStream` decodes UTF-8 incrementally, so there is no need to decode the whole buffer upfront
+    stream = pyte.ByteStream(screen)
     
-    stream.feed(data.decode(errors='ignore'))
+    stream.feed(data)
     
     top = [_line_to_text(line) for line in screen.history.top]
     current = list(screen.display)
@@ -1,21 +1,81 @@
 from dataclasses import dataclass
 import asyncio
+import collections
+import functools
 import logging
 from pydantic import BaseModel
 
-from aiorwlock import RWLock
 import yaml
 
+try:
+    # Prefer the C-backed dumper (available when PyYAML is built against libyaml)
+    from yaml import CSafeDumper as _YamlDumper
+except ImportError:
+    from yaml import SafeDumper as _YamlDumper
+
 from .terminal.block_pty_session import BlockPtySession, PtySessionStatus
 
 
 logger = logging.getLogger(__name__)
 
 
+_SESSION_STOP_BATCH_SIZE = 32
+"""The maximum number of sessions stopped concurrently when stopping the server."""
+
+
+# Response templates, formatted with `%` so that they are not rebuilt on every call
+
+_COMMAND_FINISHED_TEMPLATE = """Command finished in %.2f seconds.
+
+Executed command buffer:
+<command>
+%s
+</command>
+
+Command output:
+<command-output>
+%s
+</command-output>"""
+
+_COMMAND_TIMEOUT_TEMPLATE = """Command is still running after %.2f seconds;
+this could mean the command is doing blocking operations (e.g., disk reading, downloading)
+or is awaiting input (e.g., password, confirmation).
+
+Currently executing command buffer:
+<command>
+%s
+</command>
+
+Current command output:
+
+<command-output>
+%s
+</command-output>
+
+It is recommended to use `snapshot` on this session later to see command status,
+and use `send_keys` or `enter_root_password` to interact with the command if necessary.
+You cannot execute another command on this session until the current command finishes or get terminated."""
+
+_COMMAND_INCOMPLETE_TEMPLATE = """Current command buffer is incomplete for parsing and execution;
+call `submit_command` again to complete the command and submit for execution.
+
+Current command buffer:
+
+<command>
+%s
+</command>
+"""
+
+_SNAPSHOT_TEMPLATE = """Terminal snapshot (%s):
+<snapshot>
+%s
+</snapshot>"""
+
+
 class TerminalServerConfig(BaseModel):
     session_startup_timeout_seconds: float | None = 10.0
     """The timeout for session startup and initialization.
-    If None, the server will wait and hold the lock indefinitely until the session is initialized
+    If None, `create_session` will wait indefinitely until the session is initialized
     (this is not recommended)."""
     
     general_tool_call_timeout_seconds: float | None = 5.0
@@ -25,21 +85,51 @@ class TerminalServerConfig(BaseModel):
 class TollCallTimeoutError(Exception):
     
     def __init__(self, timeout_seconds: float, message: str | None = None):
+        super().__init__(timeout_seconds)
         self.timeout_seconds = timeout_seconds
-        self.message = message or f"Tool call timeout after {timeout_seconds} seconds"
+        self._message = message
+
+    @property
+    def message(self) -> str:
+        # Formatted only when displayed, since these errors are often caught and discarded
+        return self._message or f"Tool call timeout after {self.timeout_seconds} seconds"
+
+    def __str__(self) -> str:
+        return self.message
 
 
-@dataclass
+@dataclass(slots=True)
 class PtySessionItem:
     session: BlockPtySession
     label: str | None = None
     description: str | None = None
     pending_deletion: bool = False
+    starting_up: bool = True
+    """Whether `create_session` is still starting the session up."""
 
 
 class SessionNotFoundError(Exception):
-    def __init__(self, message: str):
-        super().__init__(message)
+
+    def __init__(self, session_id: str):
+        super().__init__(session_id)
+        self.session_id = session_id
+
+    def __str__(self) -> str:
+        return f"Session {self.session_id} not found!"
+
+
+def _dump_session_list(session_snapshots: list[tuple[str, str | None, str | None, bool, str | None]]) -> str:
+    """Serializes `(id, label, description, initialized, running command)` session snapshots into YAML."""
+    return yaml.dump([
+        {
+            "id": session_id,
+            "metadata": {
+                "label": label,
+                "description": description,
+                "runningCommand": running_command or "(No command is currently running)"
+            } if initialized else "(Session still initializing...)"
+        } for session_id, label, description, initialized, running_command in session_snapshots
+    ], Dumper=_YamlDumper, sort_keys=False, indent=2)
 
 
 class TerminalServer:
@@ -55,17 +145,27 @@ class TerminalServer:
         If None, root privilege will not be enabled.
         """
 
+        # Copy-on-write: the dictionary is never mutated in place;
+        # writers build a new dictionary and swap it in, so readers can always use it without locking.
         self._session_items: dict[str, PtySessionItem] = {}
+        # Sessions not pending deletion, in creation order; kept in sync with `pending_deletion`
+        # so that listing sessions does not need to scan and filter every session item.
+        # Only mutated synchronously (never across an `await`).
+        self._live_session_items: dict[str, PtySessionItem] = {}
         self._next_session_id = 0
 
-        # This lock only ensures no race conditions on the dictionary itself,
+        # This lock only serializes writers (session creation and deletion) on the dictionary itself,
         # but not on individual session items.
-        self._sessions_lock = RWLock()
+        # Readers do not take the lock; the dictionary is only swapped by `create_session` and `_delete_stopped_sessions_loop`.
+        # The lock is never held while a session starts up.
+        self._writer_lock = asyncio.Lock()
 
         self._config = config
         self._root_password = root_password
 
-        self._stopped_sessions_id_queue: asyncio.Queue[str] = asyncio.Queue()
+        # IDs of stopped sessions awaiting deletion; the event is set whenever an ID is appended
+        self._stopped_session_ids: collections.deque[str] = collections.deque()
+        self._stopped_sessions_event = asyncio.Event()
         self._delete_stopped_sessions_task = asyncio.create_task(self._delete_stopped_sessions_loop())
     
     async def create_session(self) -> str:
@@ -75,242 +175,253 @@ class TerminalServer:
 
         :return: The ID of the new session.
         """
-        async with self._sessions_lock.writer:
+        startup_timeout = self._config.session_startup_timeout_seconds
+
+        async with self._writer_lock:
             session_id = str(self._next_session_id)
             self._next_session_id += 1
             
             session_item = PtySessionItem(
                 session=None,
             )
-
-            async def signal_deletion():
-                session_item.pending_deletion = True
-                await self._stopped_sessions_id_queue.put(session_id)
             
             session = BlockPtySession(
                 root_password=self._root_password,
-                on_session_finished_callback=signal_deletion
+                on_session_finished_callback=functools.partial(self._on_session_finished, session_id, session_item)
             )
 
             session_item.session = session
 
-            self._session_items[session_id] = session_item
-
-            try:
-                await asyncio.wait_for(session.start(), timeout=self._config.session_startup_timeout_seconds)
-            except asyncio.TimeoutError:
-                logger.warning(f'Zsh session {session_id} failed to initialize within {self._config.session_startup_timeout_seconds} seconds; initialization job moved to background.')
+            self._session_items = {**self._session_items, session_id: session_item}
+            self._live_session_items[session_id] = session_item
+
+        # Start the session outside the lock so that a slow startup does not block other writers;
+        # readers already tolerate sessions that are not initialized yet
+        try:
+            async with asyncio.timeout(startup_timeout):
+                await session.start()
+        except asyncio.TimeoutError:
+            logger.warning('Zsh session %s failed to initialize within %s seconds; initialization job moved to background.', session_id, startup_timeout)
+        except BaseException:
+            # Startup failed or was cancelled; `PtySession.start` has already released whatever it acquired,
+            # so only the half-initialized session item is left to delete
+            session_item.pending_deletion = True
+            raise
+        finally:
+            session_item.starting_up = False
+
+            # `delete_session` leaves sessions that are starting up to us;
+            # this runs on every exit path (including cancellation), so nothing here may yield to the event loop
+            if session_item.pending_deletion:
+                if session.session_status == PtySessionStatus.RUNNING:
+                    # Stopping does not yield; deletion is then signaled by the callback invoked when the session is stopped
+                    await session.stop()
+                elif session.session_status == PtySessionStatus.NOT_STARTED:
+                    self._signal_session_deletion(session_id, session_item)
 
         return session_id
     
     async def list_sessions(self) -> str:
-        async def lock_guarded_job():
-            if len([item for item in self._session_items.values() if not item.pending_deletion]) == 0:
-                return "No sessions."
-
-            return yaml.dump([
-                {
-                    "id": session_id,
-                    "metadata": {
-                        "label": session_item.label,
-                        "description": session_item.description,
-                        "runningCommand": session_item.session.get_current_running_command() or "(No command is currently running)"
-                    } if session_item.session.session_initialized else "(Session still initializing...)"
-                } for session_id, session_item in self._session_items.items()
-                if not session_item.pending_deletion
-            ], sort_keys=False, indent=2)
-
-        async with self._sessions_lock.reader:
-            try:
-                return await asyncio.wait_for(lock_guarded_job(), timeout=self._config.general_tool_call_timeout_seconds)
-            except asyncio.TimeoutError:
-                logger.warning(f'`list_sessions` timeout after {self._config.general_tool_call_timeout_seconds} seconds')
-                raise TollCallTimeoutError(self._config.general_tool_call_timeout_seconds)
+        timeout = self._config.general_tool_call_timeout_seconds
+
+        try:
+            async with asyncio.timeout(timeout):
+                if not self._live_session_items:
+                    return "No sessions."
+
+                # Only capture session state on the event loop;
+                # building the payload and serializing it (CPU-bound) happen off the event loop
+                session_snapshots = [
+                    (
+                        session_id,
+                        session_item.label,
+                        session_item.description,
+                        session_item.session.session_initialized,
+                        session_item.session.get_current_running_command() if session_item.session.session_initialized else None,
+                    ) for session_id, session_item in self._live_session_items.items()
+                ]
+
+                return await asyncio.to_thread(_dump_session_list, session_snapshots)
+        except asyncio.TimeoutError:
+            logger.warning('`list_sessions` timeout after %s seconds', timeout)
+            raise TollCallTimeoutError(timeout)
     
     async def update_session_label(self, session_id: str, label: str):
-        async def lock_guarded_job():
-            session_item = self._session_items.get(session_id)
+        # No timeout needed; there is no `await` in between the lookup and the update
+        session_item = self._session_items.get(session_id)
 
-            if not session_item:
-                raise SessionNotFoundError(f"Session {session_id} not found!")
-            
-            session_item.label = label
+        # Sessions pending deletion are being torn down; treat them as gone
+        if not session_item or session_item.pending_deletion:
+            raise SessionNotFoundError(session_id)
 
-        async with self._sessions_lock.reader:
-            try:
-                return await asyncio.wait_for(lock_guarded_job(), timeout=self._config.general_tool_call_timeout_seconds)
-            except asyncio.TimeoutError:
-                logger.warning(f'`update_session_label` timeout after {self._config.general_tool_call_timeout_seconds} seconds')
-                raise TollCallTimeoutError(self._config.general_tool_call_timeout_seconds)
+        session_item.label = label
 
     async def update_session_description(self, session_id: str, description: str):
-        async def lock_guarded_job():
-            session_item = self._session_items.get(session_id)
+        session_item = self._session_items.get(session_id)
 
-            if not session_item:
-                raise SessionNotFoundError(f"Session {session_id} not found!")
-            
-            session_item.description = description
+        if not session_item or session_item.pending_deletion:
+            raise SessionNotFoundError(session_id)
 
-        async with self._sessions_lock.reader:
-            try:
-                return await asyncio.wait_for(lock_guarded_job(), timeout=self._config.general_tool_call_timeout_seconds)
-            except asyncio.TimeoutError:
-                logger.warning(f'`update_session_description` timed out after {self._config.general_tool_call_timeout_seconds} seconds')
-                raise TollCallTimeoutError(self._config.general_tool_call_timeout_seconds)
+        session_item.description = description
     
     async def submit_command(self, session_id: str, command: str, timeout_seconds: float = 5.0) -> str:
-        async with self._sessions_lock.reader:
-            session_item = self._session_items.get(session_id)
-
-            if not session_item:
-                raise SessionNotFoundError(f"Session {session_id} not found!")
-            
-            # TODO: Parameterize this?
-            tool_call_timeout = timeout_seconds + 1
-            
-            try:
-                result = await asyncio.wait_for(session_item.session.submit_command(command, timeout_seconds=timeout_seconds), timeout=tool_call_timeout)
-            except asyncio.TimeoutError:
-                logger.warning(f'`BlockPtySession.execute_command` timeout after {tool_call_timeout} seconds (command execution timeout was {timeout_seconds} seconds)')
-                return f"Tool call itself timeout after {tool_call_timeout} seconds. Command may or may not have been submitted to the terminal session; consider coming back and checking this terminal session later."
-
-            if result.result_type == 'finished':
-                return f"""Command finished in {result.duration_seconds:.2f} seconds.
+        session_item = self._session_items.get(session_id)
 
-Executed command buffer:
-<command>
-{result.command_buffer}
-</command>
+        if not session_item or session_item.pending_deletion:
+            raise SessionNotFoundError(session_id)
+        
+        # No outer timeout needed; `BlockPtySession.submit_command` enforces `timeout_seconds` itself
+        # and reports it as a `timeout` result
+        result = await session_item.session.submit_command(command, timeout_seconds=timeout_seconds)
+
+        if result.result_type == 'finished':
+            return _COMMAND_FINISHED_TEMPLATE % (result.duration_seconds, result.command_buffer, result.output)
+        elif result.result_type == 'timeout':
+            return _COMMAND_TIMEOUT_TEMPLATE % (result.timeout_seconds, result.command_buffer, result.output)
+        elif result.result_type == 'command_incomplete':
+            return _COMMAND_INCOMPLETE_TEMPLATE % (result.command_buffer,)
+    
+    async def snapshot(self, session_id: str, include_all: bool = False) -> str:
+        timeout = self._config.general_tool_call_timeout_seconds
 
-Command output:
-<command-output>
-{result.output}
-</command-output>"""
-            elif result.result_type == 'timeout':
-                return f"""Command is still running after {result.timeout_seconds:.2f} seconds;
-this could mean the command is doing blocking operations (e.g., disk reading, downloading)
-or is awaiting input (e.g., password, confirmation).
+        try:
+            async with asyncio.timeout(timeout):
+                session_item = self._session_items.get(session_id)
 
-Currently executing command buffer:
-<command>
-{result.command_buffer}
-</command>
+                if not session_item or session_item.pending_deletion:
+                    raise SessionNotFoundError(session_id)
 
-Current command output:
+                snapshot = await session_item.session.snapshot(include_all=include_all)
 
-<command-output>
-{result.output}
-</command-output>
+                return _SNAPSHOT_TEMPLATE % ('including all outputs' if include_all else 'starting from last command input', snapshot)
+        except asyncio.TimeoutError:
+            logger.warning('`snapshot` timeout after %s seconds', timeout)
+            raise TollCallTimeoutError(timeout)
+    
+    async def send_keys(self, session_id: str, keys: str):
+        timeout = self._config.general_tool_call_timeout_seconds
 
-It is recommended to use `snapshot` on this session later to see command status,
-and use `send_keys` or `enter_root_password` to interact with the command if necessary.
-You cannot execute another command on this session until the current command finishes or get terminated."""
-            elif result.result_type == 'command_incomplete':
-                return f"""Current command buffer is incomplete for parsing and execution;
-call `submit_command` again to complete the command and submit for execution.
+        try:
+            async with asyncio.timeout(timeout):
+                session_item = self._session_items.get(session_id)
 
-Current command buffer:
+                if not session_item or session_item.pending_deletion:
+                    raise SessionNotFoundError(session_id)
 
-<command>
-{result.command_buffer}
-</command>
-"""
+                await session_item.session.send_keys(keys)
+        except asyncio.TimeoutError:
+            logger.warning('`send_keys` timeout after %s seconds', timeout)
+            raise TollCallTimeoutError(timeout)
     
-    async def snapshot(self, session_id: str, include_all: bool = False) -> str:
-        
-        async def lock_guarded_job():
-            session_item = self._session_items.get(session_id)
+    async def enter_root_password(self, session_id: str):
+        timeout = self._config.general_tool_call_timeout_seconds
 
-            if not session_item:
-                raise SessionNotFoundError(f"Session {session_id} not found!")
-            
-            snapshot = await session_item.session.snapshot(include_all=include_all)
+        try:
+            async with asyncio.timeout(timeout):
+                session_item = self._session_items.get(session_id)
 
-            return f"""Terminal snapshot ({'including all outputs' if include_all else 'starting from last command input'}):
-<snapshot>
-{snapshot}
-</snapshot>"""
+                if not session_item or session_item.pending_deletion:
+                    raise SessionNotFoundError(session_id)
 
-        async with self._sessions_lock.reader:
-            try:
-                return await asyncio.wait_for(lock_guarded_job(), timeout=self._config.general_tool_call_timeout_seconds)
-            except asyncio.TimeoutError:
-                logger.warning(f'`snapshot` timeout after {self._config.general_tool_call_timeout_seconds} seconds')
-                raise TollCallTimeoutError(self._config.general_tool_call_timeout_seconds)
+                await session_item.session.enter_root_password()
+        except asyncio.TimeoutError:
+            logger.warning('`enter_root_password` timeout after %s seconds', timeout)
+            raise TollCallTimeoutError(timeout)
     
-    async def send_keys(self, session_id: str, keys: str):
-        async def lock_guarded_job():
-            session_item = self._session_items.get(session_id)
-
-            if not session_item:
-                raise SessionNotFoundError(f"Session {session_id} not found!")
-            
-            await session_item.session.send_keys(keys)
+    async def delete_session(self, session_id: str):
+        timeout = self._config.general_tool_call_timeout_seconds
 
-        async with self._sessions_lock.reader:
+        async with self._writer_lock:
             try:
-                return await asyncio.wait_for(lock_guarded_job(), timeout=self._config.general_tool_call_timeout_seconds)
-            except asyncio.TimeoutError:
-                logger.warning(f'`send_keys` timeout after {self._config.general_tool_call_timeout_seconds} seconds')
-                raise TollCallTimeoutError(self._config.general_tool_call_timeout_seconds)
-    
-    async def enter_root_password(self, session_id: str):
-        async def lock_guarded_job():
-            session_item = self._session_items.get(session_id)
+                async with asyncio.timeout(timeout):
+                    session_item = self._session_items.get(session_id)
 
-            if not session_item:
-                raise SessionNotFoundError(f"Session {session_id} not found!")
-            
-            await session_item.session.enter_root_password()
+                    if not session_item:
+                        raise SessionNotFoundError(session_id)
 
-        async with self._sessions_lock.reader:
-            try:
-                return await asyncio.wait_for(lock_guarded_job(), timeout=self._config.general_tool_call_timeout_seconds)
+                    session_item.pending_deletion = True
+                    self._live_session_items.pop(session_id, None)
+
+                    if session_item.session.session_status != PtySessionStatus.NOT_STARTED:
+                        await session_item.session.stop()
+
+                        # No need to delete the session;
+                        # deletion is signaled by the callback invoked when the session is stopped,
+                        # and the session will be subsequently deleted by the custom garbage collection system
+                    elif not session_item.starting_up:
+                        # The session never started (its startup timed out), so there is nothing to stop
+                        self._signal_session_deletion(session_id, session_item)
+
+                    # Otherwise, the session is still starting up; `create_session` stops it once startup completes
             except asyncio.TimeoutError:
-                logger.warning(f'`enter_root_password` timeout after {self._config.general_tool_call_timeout_seconds} seconds')
-                raise TollCallTimeoutError(self._config.general_tool_call_timeout_seconds)
+                logger.warning('`delete_session` timeout after %s seconds', timeout)
+                raise TollCallTimeoutError(timeout)
     
-    async def delete_session(self, session_id: str):
-        async def lock_guarded_job():
-            session_item = self._session_items.get(session_id)
-            
-            if not session_item:
-                raise SessionNotFoundError(f"Session {session_id} not found!")
-            
-            session_item.pending_deletion = True
-            await session_item.session.stop()
-            
-            # No need to delete the session;
-            # deletion is signaled by the callback invoked when the session is stopped,
-            # and the session will be subsequently deleted by the custom garbage collection system
-        
-        async with self._sessions_lock.writer:
-            try:
-                return await asyncio.wait_for(lock_guarded_job(), timeout=self._config.general_tool_call_timeout_seconds)
-            except asyncio.TimeoutError:
-                logger.warning(f'`delete_session` timeout after {self._config.general_tool_call_timeout_seconds} seconds')
-                raise TollCallTimeoutError(self._config.general_tool_call_timeout_seconds)
+    async def _on_session_finished(self, session_id: str, session_item: PtySessionItem):
+        """Marks a finished session for deletion and signals the garbage collection loop."""
+        self._signal_session_deletion(session_id, session_item)
+
+    def _signal_session_deletion(self, session_id: str, session_item: PtySessionItem):
+        """Marks a finished or never started session for deletion and signals the garbage collection loop."""
+        session_item.pending_deletion = True
+        self._live_session_items.pop(session_id, None)
+        self._stopped_session_ids.append(session_id)
+        self._stopped_sessions_event.set()
     
     async def _delete_stopped_sessions_loop(self):
         while True:
-            session_id = await self._stopped_sessions_id_queue.get()
-
-            async with self._sessions_lock.writer:
-                if session_id not in self._session_items:
-                    logger.warning(f'Session with ID {session_id} not found, skipping deletion')
-                    continue
-                
-                if self._session_items[session_id].session.session_status != PtySessionStatus.FINISHED:
-                    logger.warning(f'Attempting to delete session {session_id} which is not finished, force stopping it; notice that this is not expected behavior (possible bug)!')
-                    await self._session_items[session_id].session.stop()
-
-                del self._session_items[session_id]
+            # Wait for stopped sessions, then drain all of them
+            # so that a burst of stopped sessions is deleted under a single lock acquisition
+            await self._stopped_sessions_event.wait()
+            self._stopped_sessions_event.clear()
+
+            session_ids = list(self._stopped_session_ids)
+            self._stopped_session_ids.clear()
+
+            async with self._writer_lock:
+                session_items = dict(self._session_items)
+
+                for session_id in session_ids:
+                    session_item = session_items.get(session_id)
+
+                    if not session_item:
+                        logger.warning('Session with ID %s not found, skipping deletion', session_id)
+                        continue
+                    
+                    # Sessions that never started have nothing to stop
+                    if session_item.session.session_status == PtySessionStatus.RUNNING:
+                        logger.warning('Attempting to delete session %s which is not finished, force stopping it; notice that this is not expected behavior (possible bug)!', session_id)
+                        await session_item.session.stop()
+
+                    del session_items[session_id]
+                    self._live_session_items.pop(session_id, None)
+
+                self._session_items = session_items
     
     async def stop(self):
         """Stops the server.
         Stops all current terminal sessions.
         """
 
-        await asyncio.gather(session_item.session.stop() for session_item in self._session_items.values())
+        # Stop sessions concurrently in bounded batches;
+        # failing to stop one session (e.g., one that never started) must not prevent stopping the others
+        session_items = list(self._session_items.items())
+
+        for batch_start in range(0, len(session_items), _SESSION_STOP_BATCH_SIZE):
+            batch = session_items[batch_start:batch_start + _SESSION_STOP_BATCH_SIZE]
+            results = await asyncio.gather(
+                *(session_item.session.stop() for _, session_item in batch),
+                return_exceptions=True
+            )
+
+            for (session_id, _), result in zip(batch, results):
+                if isinstance(result, BaseException):
+                    logger.warning('Failed to stop session %s during server shutdown: %r', session_id, result)
+
+        self._delete_stopped_sessions_task.cancel()
+
+        try:
+            await self._delete_stopped_sessions_task
+        except asyncio.CancelledError:
+            pass
         
\ No newline at end of file